@@ -106,6 +106,22 @@ class BuildDirs:
             else:
                 return self._check_maybe_removed_dir(norm_cased_dir)
 
+    def is_known_norm_cased_dir(self, norm_cased_dir):
+        """Return whether we know that the specified directory exists.
+
+        Return whether we have already established that the specified
+        norm-cased directory exists in the virtual state of the file
+        system, because it is reserved for a file we are building or
+        have built. If this returns ``False``, the directory may or may
+        not exist.
+
+        This doesn't consult ``_exists_dirs``. A build function may
+        remove a directory that doesn't contain any output files, and
+        we wouldn't find out about it.
+        """
+        with self._lock:
+            return norm_cased_dir in self._build_dir_counts
+
     def handle_norm_cased_dir_exists(self, norm_cased_dir):
         """Respond to the existence of the specified norm-cased directory.
 
@@ -180,14 +196,15 @@ class BuildDirs:
                 prev_parent = parent
                 parent = os.path.dirname(parent)
 
-    def created_dirs(self):
+    def created_dirs_map(self):
         """Return the directories virtually created during the current build.
 
-        Return a list of the non-norm-cased filenames of the directories
-        that were virtually created during the current build.
+        Return a map from the norm-cased filename of each directory that
+        was virtually created during the current build to the
+        corresponding non-norm-cased filename.
         """
         with self._lock:
-            return list(self._created_dirs_map.values())
+            return dict(self._created_dirs_map)
 
     def norm_cased_error_created_dirs(self):
         """Return the norm-cased filenames of the error directories.
@@ -139,10 +139,15 @@ class Cache:
         """Return the cache key for the specified ``SubbuildOperation``.
 
         The cache key is an object that uniquely identifies the
-        operation's function name and arguments.
+        operation's function name and arguments. We compute it at most
+        once per operation and store it on the operation record.
         """
-        return JsonUtil.to_hashable([
-            operation.func_name, operation.args, operation.kwargs])
+        subbuild_key = operation._subbuild_key
+        if subbuild_key is None:
+            subbuild_key = JsonUtil.to_hashable([
+                operation.func_name, operation.args, operation.kwargs])
+            operation._subbuild_key = subbuild_key
+        return subbuild_key
 
     def build_name(self):
         return self._build_name
@@ -404,6 +409,14 @@ class Cache:
         """
         return self._func_versions.get(func_name)
 
+    def func_names_with_versions(self):
+        """Return the names of the functions that have versions.
+
+        Return a list of the names of the functions that have entries in
+        the ``versions`` argument to ``FileBuilder.build_versioned``.
+        """
+        return list(self._func_versions.keys())
+
     def get_operation_version(self, operation_name):
         """Return the version associated with the specified simple operation.
 
@@ -446,10 +459,15 @@ class Cache:
             'software': Cache._SOFTWARE,
         }
 
-        with gzip.open(filename, 'wt') as file_:
-            # Sort keys in order to improve compression
-            file_.write(
-                json.dumps(cache_json, separators=(',', ':'), sort_keys=True))
+        # Sort keys in order to improve compression. json.dumps only produces
+        # ASCII characters, so we can skip gzip's text wrapper and write the
+        # encoded bytes directly. We use the default zlib compression level
+        # rather than gzip's maximum level, as it is substantially faster and
+        # the files are nearly as small.
+        cache_bytes = json.dumps(
+            cache_json, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        with gzip.open(filename, 'wb', compresslevel=6) as file_:
+            file_.write(cache_bytes)
 
     @staticmethod
     def read_immutable(filename):
@@ -477,8 +495,9 @@ class Cache:
                     'The requested file does not exist: {:s}'.format(filename))
 
         try:
-            with gzip.open(filename, 'rt') as file_:
-                cache_json = json.load(file_)
+            with gzip.open(filename, 'rb') as file_:
+                cache_bytes = file_.read()
+            cache_json = json.loads(cache_bytes.decode('utf-8'))
         except (EOFError, OSError, ValueError, zlib.error):
             raise RuntimeError(
                 'Error reading or parsing cache file {:s}'.format(filename))
@@ -618,9 +637,9 @@ class Cache:
         Return the JSON value representation that ``write`` uses to
         store the specified ``ComplexOperation``.
         """
-        suboperations_json = []
-        for suboperation in operation.suboperations:
-            suboperations_json.append(self._operation_to_json(suboperation))
+        suboperations_json = [
+            self._operation_to_json(suboperation)
+            for suboperation in operation.suboperations]
         operation_json = {
             'args': operation.args,
             'funcName': operation.func_name,
@@ -720,8 +739,6 @@ class Cache:
     @staticmethod
     def _operations_from_json(operations_json, files, subbuilds):
         """Equivalent implementation is contractually guaranteed."""
-        operations = []
-        for operation_json in operations_json:
-            operations.append(
-                Cache._operation_from_json(operation_json, files, subbuilds))
-        return operations
+        return [
+            Cache._operation_from_json(operation_json, files, subbuilds)
+            for operation_json in operations_json]
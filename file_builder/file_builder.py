@@ -1,4 +1,5 @@
-import copy
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import logging
 import os
 from pathlib import Path
@@ -11,7 +12,6 @@ from .file_backups import FileBackups
 from .file_comparison import FileComparison
 from .json_util import JsonUtil
 from .operation import BuildFileOperation
-from .operation import ComplexOperation
 from .operation import SimpleOperation
 from .operation import SubbuildOperation
 from .simple_operation_executor import SimpleOperationExecutor
@@ -218,6 +218,12 @@ class FileBuilder:
     #     FileBuilder instances for the current build.
     # BuildDirs _build_dirs - The BuildDirs instance for the current build.
     #     This is shared across all FileBuilder instances for the build.
+    # set<str> _changed_func_names - The names of the functions whose versions
+    #     in _new_cache differ from their versions in _old_cache, as in
+    #     JsonUtil.is_equal. Function versions don't change during a build, so
+    #     we compute this once, rather than comparing the versions every time
+    #     we check a cache entry. This is shared across all FileBuilder
+    #     instances for the build.
     # bool _is_finished_build - Whether this is a FileBuilder instance for the
     #     root build function (i.e. _operation is None), and the root build
     #     function has finished executing.
@@ -243,9 +249,14 @@ class FileBuilder:
     # Whether the operating system is Windows
     _IS_WINDOWS = os.name == 'nt'
 
+    # The minimum number of files or directories for which
+    # _try_to_remove_files and _remove_empty_dirs use a thread pool. For fewer
+    # files, the cost of starting the threads outweighs the benefit.
+    _MIN_CONCURRENT_REMOVE_COUNT = 16
+
     def __init__(
             self, operation, old_cache, new_cache, simple_operation_executor,
-            backups, build_dirs):
+            backups, build_dirs, changed_func_names):
         """Private initializer."""
         self._operation = operation
         self._old_cache = old_cache
@@ -253,6 +264,7 @@ class FileBuilder:
         self._simple_operation_executor = simple_operation_executor
         self._backups = backups
         self._build_dirs = build_dirs
+        self._changed_func_names = changed_func_names
         self._is_finished_build = False
         self._lock = threading.Lock()
 
@@ -368,23 +380,29 @@ class FileBuilder:
         cache_filename = FileBuilder._sanitize_filename(cache_filename)
         sanitized_versions = FileBuilder._sanitize_versions(versions)
 
-        if os.path.isfile(cache_filename):
+        # Optimization: Cache.read_immutable checks whether the cache file is
+        # a regular file, so we rely on its exceptions rather than stat-ing the
+        # file ourselves first
+        try:
             old_cache = Cache.read_immutable(cache_filename)
-            if old_cache.build_name() != build_name:
-                raise RuntimeError(
-                    'The cache file was created for the build named {:s}, '
-                    'which is different from the specified build name '
-                    '{:s}'.format(old_cache.build_name(), build_name))
-        elif os.path.isdir(cache_filename):
+        except FileNotFoundError:
+            old_cache = None
+        except IsADirectoryError:
             raise IsADirectoryError(
                 "The cache file is an existing directory, so we can't write "
-                'to it: {:s}'.format(cache_filename))
-        else:
+                'to it: {:s}'.format(cache_filename)) from None
+
+        if old_cache is None:
             logger.info(
                 'The cache file {:s} does not exist, so building everything '
                 'from scratch'.format(cache_filename))
             old_cache = Cache.create_empty_immutable(
                 build_name, sanitized_versions)
+        elif old_cache.build_name() != build_name:
+            raise RuntimeError(
+                'The cache file was created for the build named {:s}, which '
+                'is different from the specified build name {:s}'.format(
+                    old_cache.build_name(), build_name))
 
         new_cache = Cache.create_empty_mutable(build_name, sanitized_versions)
         build_dirs = BuildDirs(
@@ -392,10 +410,12 @@ class FileBuilder:
             old_cache.created_files() + [cache_filename])
         simple_operation_executor = SimpleOperationExecutor(
             cache_filename, old_cache, new_cache, build_dirs)
+        changed_func_names = FileBuilder._compute_changed_func_names(
+            old_cache, new_cache)
         with FileBackups() as backups:
             builder = FileBuilder(
                 None, old_cache, new_cache, simple_operation_executor, backups,
-                build_dirs)
+                build_dirs, changed_func_names)
             try:
                 return builder._build(cache_filename, func, args, kwargs)
             finally:
@@ -577,7 +597,7 @@ class FileBuilder:
         filename = FileBuilder._sanitize_filename(filename)
         if not isinstance(func_name, str):
             raise TypeError('Function name must be a string')
-        if not isinstance(file_comparison, FileComparison):
+        if file_comparison.__class__ is not FileComparison:
             raise TypeError(
                 'file_comparison must be an instance of FileComparison')
         if not callable(func):
@@ -590,7 +610,8 @@ class FileBuilder:
             sanitized_kwargs, [], None, None, False, False, False)
         subbuilder = FileBuilder(
             suboperation, self._old_cache, self._new_cache,
-            self._simple_operation_executor, self._backups, self._build_dirs)
+            self._simple_operation_executor, self._backups, self._build_dirs,
+            self._changed_func_names)
         try:
             subbuilder._build_file(func)
         except Exception:
@@ -719,7 +740,8 @@ class FileBuilder:
             False, False)
         subbuilder = FileBuilder(
             suboperation, self._old_cache, self._new_cache,
-            self._simple_operation_executor, self._backups, self._build_dirs)
+            self._simple_operation_executor, self._backups, self._build_dirs,
+            self._changed_func_names)
         try:
             subbuilder._subbuild(func)
         except Exception:
@@ -760,13 +782,7 @@ class FileBuilder:
                 executing the relevant call to ``build_file*``,
                 ``subbuild``, ``build``, or ``build_versioned``.
         """
-        filename = FileBuilder._sanitize_filename(filename)
-        if not isinstance(file_comparison, FileComparison):
-            raise TypeError(
-                'file_comparison must be an instance of FileComparison')
-        self._exec_simple_operation(
-            SimpleOperation('read', [filename, file_comparison.name]))
-        return open(filename, 'r')
+        return open(self._record_read(filename, file_comparison), 'r')
 
     def read_binary(self, filename, file_comparison=FileComparison.METADATA):
         """Open the specified file for reading binary content.
@@ -796,13 +812,7 @@ class FileBuilder:
                 executing the relevant call to ``build_file*``,
                 ``subbuild``, ``build``, or ``build_versioned``.
         """
-        filename = FileBuilder._sanitize_filename(filename)
-        if not isinstance(file_comparison, FileComparison):
-            raise TypeError(
-                'file_comparison must be an instance of FileComparison')
-        self._exec_simple_operation(
-            SimpleOperation('read', [filename, file_comparison.name]))
-        return open(filename, 'rb')
+        return open(self._record_read(filename, file_comparison), 'rb')
 
     def declare_read(self, filename, file_comparison=FileComparison.METADATA):
         """Declare that we are reading the specified file.
@@ -846,14 +856,7 @@ class FileBuilder:
                 executing the relevant call to ``build_file*``,
                 ``subbuild``, ``build``, or ``build_versioned``.
         """
-        if not isinstance(file_comparison, FileComparison):
-            raise TypeError(
-                'file_comparison must be an instance of FileComparison')
-        self._exec_simple_operation(
-            SimpleOperation(
-                'read', [
-                    FileBuilder._sanitize_filename(filename),
-                    file_comparison.name]))
+        self._record_read(filename, file_comparison)
 
     def list_dir(self, dir_):
         """Return the subfiles of the specified directory.
@@ -940,7 +943,8 @@ class FileBuilder:
                 executing the relevant call to ``build_file*``,
                 ``subbuild``, ``build``, or ``build_versioned``.
         """
-        if not isinstance(top_down, bool):
+        # bool can't be subclassed, so this is equivalent to isinstance
+        if top_down.__class__ is not bool:
             raise TypeError('top_down must be a boolean')
         return self._exec_simple_operation(
             SimpleOperation(
@@ -1056,31 +1060,77 @@ class FileBuilder:
         """Raise if ``_operation.is_finished`` or ``_is_finished_build``."""
         operation = self._operation
         if operation is not None:
-            is_finished = operation.is_finished
+            if operation.is_finished:
+                FileBuilder._raise_finished(operation)
+        elif self._is_finished_build:
+            FileBuilder._raise_finished(None)
+
+    @staticmethod
+    def _raise_finished(operation):
+        """Raise the exception for ``_assert_not_finished``.
+
+        We keep this separate from ``_assert_not_finished`` so that the
+        common case, where we don't raise, doesn't have to deal with
+        composing the error message.
+
+        Arguments:
+            operation (ComplexOperation): The ``_operation`` field of
+                the ``FileBuilder`` that has finished executing. This is
+                ``None`` for the root build function.
+        """
+        if isinstance(operation, BuildFileOperation):
+            description = 'the build_file* call for {:s}'.format(
+                operation.filename)
+        elif isinstance(operation, SubbuildOperation):
+            description = 'the subbuild function {:s}'.format(
+                operation.func_name)
+        elif operation is None:
+            description = 'the build function'
         else:
-            is_finished = self._is_finished_build
-
-        if is_finished:
-            if isinstance(operation, BuildFileOperation):
-                description = 'the build_file* call for {:s}'.format(
-                    operation.filename)
-            elif isinstance(operation, SubbuildOperation):
-                description = 'the subbuild function {:s}'.format(
-                    operation.func_name)
-            elif operation is None:
-                description = 'the build function'
-            else:
-                raise RuntimeError('Unhandled operation type')
+            raise RuntimeError('Unhandled operation type')
 
-            raise RuntimeError(
-                'This FileBuilder instance has already finished executing '
-                '{:s}'.format(description))
+        raise RuntimeError(
+            'This FileBuilder instance has already finished executing '
+            '{:s}'.format(description))
+
+    def _record_read(self, filename, file_comparison):
+        """Perform the simple operation for reading the specified file.
+
+        This is the shared implementation of ``read_text``,
+        ``read_binary``, and ``declare_read``. It returns the sanitized
+        filename.
+
+        Raises:
+            TypeError: If one of the arguments has the wrong type.
+            FileNotFoundError: If the file does not exist, according to
+                the virtual state of the file system.
+            IsADirectoryError: If the filename refers to a directory,
+                according to the virtual state of the file system.
+            OSError: If some other type of OS error occurred.
+            Exception: If this ``FileBuilder`` instance has finished
+                executing the relevant call to ``build_file*``,
+                ``subbuild``, ``build``, or ``build_versioned``.
+        """
+        filename = FileBuilder._sanitize_filename(filename)
+        if file_comparison.__class__ is not FileComparison:
+            raise TypeError(
+                'file_comparison must be an instance of FileComparison')
+        self._exec_simple_operation(
+            SimpleOperation('read', [filename, file_comparison._cached_name]))
+        return filename
 
     def _append_suboperation(self, suboperation):
         """Append the specified ``Operation`` to ``_operation.suboperations``.
 
         If ``_operation`` is ``None``, this simply calls
         ``_assert_not_finished()``.
+
+        Note that we must record suboperations even if ``_operation``
+        will raise, or if its function version differs from the one in
+        ``_old_cache``. If another function catches the exception, we
+        may reuse the cache entry for an operation that raised, and the
+        version in ``_old_cache`` has no bearing on whether the next
+        build can reuse the entry we are creating now.
         """
         if self._operation is None:
             self._assert_not_finished()
@@ -1121,7 +1171,7 @@ class FileBuilder:
         """
         try:
             return self._simple_operation_executor.file_comparison_result(
-                filename, file_comparison.name)
+                filename, file_comparison._cached_name)
         except (FileNotFoundError, IsADirectoryError):
             return None
 
@@ -1160,9 +1210,7 @@ class FileBuilder:
                 updates this according to the files that would be
                 created if we executed the operation.
         """
-        if (not JsonUtil.is_equal(
-                self._old_cache.get_func_version(operation.func_name),
-                self._new_cache.get_func_version(operation.func_name)) or
+        if (operation.func_name in self._changed_func_names or
                 (not operation.raised and
                     not self._is_build_file_cached(operation)) or
 
@@ -1209,9 +1257,7 @@ class FileBuilder:
                 updates this according to the files that would be
                 created if we executed the operation.
         """
-        if (not JsonUtil.is_equal(
-                self._old_cache.get_func_version(operation.func_name),
-                self._new_cache.get_func_version(operation.func_name)) or
+        if (operation.func_name in self._changed_func_names or
 
                 # If setup failed, then the conditions that gave rise to the
                 # failure might no longer hold. See SetupFailedTest for an
@@ -1238,13 +1284,10 @@ class FileBuilder:
             created_files (CreatedFiles): The ``CreatedFiles`` that we
                 should regard as created, if any.
         """
+        # This also handles the case where future releases of FileBuilder add
+        # new operations
         name = operation.name
-        if (not JsonUtil.is_equal(
-                self._old_cache.get_operation_version(name),
-                self._new_cache.get_operation_version(name)) or
-
-                # In case future releases of FileBuilder add new operations
-                name not in SimpleOperationExecutor.OPERATIONS):
+        if not self._simple_operation_executor.is_reusable_operation(name):
             return False
 
         try:
@@ -1258,6 +1301,15 @@ class FileBuilder:
             JsonUtil.is_equal(return_value, operation.return_value) and
             exception_type_str == operation.exception_type_str)
 
+    # A map from each concrete Operation class to the method that checks
+    # whether an operation of that class is cached. This is faster than a
+    # chain of isinstance checks.
+    _IS_OPERATION_CACHED_FUNCS = {
+        BuildFileOperation: _is_build_file_operation_cached,
+        SimpleOperation: _is_simple_operation_cached,
+        SubbuildOperation: _is_subbuild_operation_cached,
+    }
+
     def _are_suboperations_cached(self, operation, created_files):
         """Return whether the specified operation's suboperations are cached.
 
@@ -1274,21 +1326,13 @@ class FileBuilder:
                 this according to the files that would be created if we
                 executed the suboperations.
         """
+        is_cached_funcs = FileBuilder._IS_OPERATION_CACHED_FUNCS
         for suboperation in operation.suboperations:
-            if isinstance(suboperation, BuildFileOperation):
-                if not self._is_build_file_operation_cached(
-                        suboperation, created_files):
-                    return False
-            elif isinstance(suboperation, SubbuildOperation):
-                if not self._is_subbuild_operation_cached(
-                        suboperation, created_files):
-                    return False
-            elif isinstance(suboperation, SimpleOperation):
-                if not self._is_simple_operation_cached(
-                        suboperation, created_files):
-                    return False
-            else:
+            is_cached_func = is_cached_funcs.get(suboperation.__class__)
+            if is_cached_func is None:
                 raise RuntimeError('Unhandled operation type')
+            if not is_cached_func(self, suboperation, created_files):
+                return False
         return True
 
     def _build_file_cache_lookup(self):
@@ -1302,9 +1346,7 @@ class FileBuilder:
         cached_operation = self._old_cache.get_file(operation.filename)
         if (cached_operation is not None and not cached_operation.raised and
                 cached_operation.func_name == operation.func_name and
-                JsonUtil.is_equal(
-                    self._old_cache.get_func_version(operation.func_name),
-                    self._new_cache.get_func_version(operation.func_name)) and
+                operation.func_name not in self._changed_func_names and
                 JsonUtil.is_equal(cached_operation.args, operation.args) and
                 JsonUtil.is_equal(
                     cached_operation.kwargs, operation.kwargs) and
@@ -1329,9 +1371,7 @@ class FileBuilder:
         operation = self._operation
         cached_operation = self._old_cache.get_subbuild(subbuild_key)
         if (cached_operation is not None and not cached_operation.raised and
-                JsonUtil.is_equal(
-                    self._old_cache.get_func_version(operation.func_name),
-                    self._new_cache.get_func_version(operation.func_name)) and
+                operation.func_name not in self._changed_func_names and
                 self._are_suboperations_cached(
                     cached_operation, CreatedFiles())):
             return cached_operation
@@ -1346,21 +1386,85 @@ class FileBuilder:
         suboperations of the specified cached ``ComplexOperation``
         entry.
         """
+        self._apply_cached_suboperations_with_dirs(operation, set())
+
+    def _apply_cached_suboperations_with_dirs(self, operation, made_dirs):
+        """Implementation of ``_apply_cached_suboperations``.
+
+        Arguments:
+            operation (ComplexOperation): The cached operation.
+            made_dirs (set<str>): The directories we have passed to
+                ``_make_dirs`` during the current call to
+                ``_apply_cached_suboperations``. We add to this as we
+                make directories. Once we start building a file in a
+                directory, ``_build_dirs`` regards the directory as
+                existing for the rest of the build, so calling
+                ``_make_dirs`` on it again would have no effect.
+        """
+        # SimpleOperations don't change the file system, so they have no
+        # entry in _APPLY_CACHED_FUNCS
+        apply_cached_funcs = FileBuilder._APPLY_CACHED_FUNCS
         for suboperation in operation.suboperations:
-            if (isinstance(suboperation, BuildFileOperation) and
-                    not suboperation.raised):
-                filename = suboperation.filename
-                created_dirs = self._make_dirs(os.path.dirname(filename))
-                locked_created_dirs = self._build_dirs.started_building_file(
-                    filename, created_dirs)
-                try:
-                    self._ensure_dirs_case(locked_created_dirs)
-                    self._apply_cached_suboperations(suboperation)
-                except Exception:
-                    self._build_dirs.error_building_file(filename)
-                    raise
-            elif isinstance(suboperation, ComplexOperation):
-                self._apply_cached_suboperations(suboperation)
+            apply_cached_func = apply_cached_funcs.get(suboperation.__class__)
+            if apply_cached_func is not None:
+                apply_cached_func(self, suboperation, made_dirs)
+
+    def _apply_cached_build_file_operation(self, operation, made_dirs):
+        """Make the file system changes for reusing a cached build file entry.
+
+        Make the changes to the file system needed to apply the results
+        of the specified cached ``BuildFileOperation``, including its
+        suboperations. See ``_apply_cached_suboperations_with_dirs``.
+        """
+        if operation.raised:
+            # The output file wasn't built, but files its function built
+            # before raising were
+            self._apply_cached_suboperations_with_dirs(operation, made_dirs)
+            return
+
+        filename = operation.filename
+        dir_ = os.path.dirname(filename)
+        if dir_ in made_dirs:
+            created_dirs = []
+        else:
+            created_dirs = self._make_dirs(dir_)
+            made_dirs.add(dir_)
+        locked_created_dirs = self._build_dirs.started_building_file(
+            filename, created_dirs)
+        try:
+            self._ensure_dirs_case(locked_created_dirs)
+            self._apply_cached_suboperations_with_dirs(operation, made_dirs)
+        except Exception:
+            self._build_dirs.error_building_file(filename)
+            raise
+
+    # A map from each concrete Operation class whose cached results we need to
+    # apply to the file system to the method that applies them, as in
+    # _apply_cached_suboperations_with_dirs. This is faster than a chain of
+    # isinstance checks.
+    _APPLY_CACHED_FUNCS = {
+        BuildFileOperation: _apply_cached_build_file_operation,
+        SubbuildOperation: _apply_cached_suboperations_with_dirs,
+    }
+
+    def _is_file_or_dir_to_make_in(self, dir_, created_files):
+        """Return ``(is_file, is_dir)`` for ``dir_``, for ``_dirs_to_make``.
+
+        This is the same as
+        ``_simple_operation_executor.is_file_or_dir(dir_,
+        created_files)``, except that if ``created_files`` is ``None``,
+        we skip checking the real file system for directories that are
+        reserved for output files, as in
+        ``BuildDirs.is_known_norm_cased_dir``. Typically, we build many
+        files in the same directory, so this saves a ``stat`` call for
+        most calls to ``_make_dirs``.
+        """
+        if (created_files is None and
+                self._build_dirs.is_known_norm_cased_dir(
+                    os.path.normcase(dir_))):
+            return False, True
+        return self._simple_operation_executor.is_file_or_dir(
+            dir_, created_files)
 
     def _dirs_to_make(self, dir_, created_files):
         """Return the parents of ``dir_`` needed to create to make ``dir_``.
@@ -1384,10 +1488,8 @@ class FileBuilder:
         """
         parents = []
         parent = dir_
-        is_dir = self._simple_operation_executor.is_dir(parent, created_files)
-        is_file = (
-            not is_dir and
-            self._simple_operation_executor.is_file(parent, created_files))
+        is_file, is_dir = self._is_file_or_dir_to_make_in(
+            parent, created_files)
         while not is_file and not is_dir:
             if self._simple_operation_executor.is_cache_file(parent):
                 raise NotADirectoryError(
@@ -1403,11 +1505,8 @@ class FileBuilder:
                     'Unable to create directory {:s}, because {:s} does not '
                     'exist'.format(dir_, parent))
 
-            is_dir = self._simple_operation_executor.is_dir(
+            is_file, is_dir = self._is_file_or_dir_to_make_in(
                 parent, created_files)
-            is_file = (
-                not is_dir and
-                self._simple_operation_executor.is_file(parent, created_files))
 
         if is_file:
             raise NotADirectoryError(
@@ -1439,18 +1538,26 @@ class FileBuilder:
         """
         dirs_to_make = self._dirs_to_make(dir_, None)
         for parent in dirs_to_make:
-            if (os.path.isfile(parent) and
-                    self._old_cache.created_norm_cased_file(
-                        os.path.normcase(parent)) and
-                    self._backups.back_up_and_remove(parent)):
+            # Optimization: Try to create the directory before checking
+            # whether there is a file in the way, since there usually isn't.
+            # This saves a stat call per directory.
+            try:
+                os.mkdir(parent)
+            except FileExistsError:
+                if not (
+                        os.path.isfile(parent) and
+                        self._old_cache.created_norm_cased_file(
+                            os.path.normcase(parent)) and
+                        self._backups.back_up_and_remove(parent)):
+                    continue
                 logger.info(
                     'Moved {:s} to a temporary directory, in order to create '
                     'a directory with that filename'.format(parent))
 
-            try:
-                os.mkdir(parent)
-            except FileExistsError:
-                continue
+                try:
+                    os.mkdir(parent)
+                except FileExistsError:
+                    continue
             logger.info('Created directory {:s}'.format(parent))
         return dirs_to_make
 
@@ -1472,15 +1579,30 @@ class FileBuilder:
                 output file we are making room for. We only use this if
                 there is an error, as part of the error message.
         """
-        for subfile in os.listdir(dir_):
-            absolute_subfile = os.path.join(dir_, subfile)
-            if os.path.isdir(absolute_subfile):
-                if self._simple_operation_executor.is_dir(absolute_subfile):
+        # Read all of the entries before we start removing files
+        dir_entries = list(os.scandir(dir_))
+
+        for dir_entry in dir_entries:
+            absolute_subfile = dir_entry.path
+
+            # Equivalent to os.path.isdir(absolute_subfile), but DirEntry
+            # normally avoids a stat call
+            try:
+                is_real_dir = dir_entry.is_dir()
+            except OSError:
+                is_real_dir = False
+
+            # Pass dir_entry so that checking the virtual state of the file
+            # system doesn't stat the file again
+            if is_real_dir:
+                if self._simple_operation_executor.is_dir_using_dir_entry(
+                        absolute_subfile, dir_entry):
                     error = True
                 else:
                     self._make_room(absolute_subfile, make_room_filename)
                     error = False
-            elif self._simple_operation_executor.is_file(absolute_subfile):
+            elif self._simple_operation_executor.is_file_using_dir_entry(
+                    absolute_subfile, dir_entry):
                 error = True
             else:
                 if self._backups.back_up_and_remove(absolute_subfile):
@@ -1516,11 +1638,18 @@ class FileBuilder:
         ``_has_case('C:\\foo\\Bar')`` will return ``True``. The return
         value is unspecified if the file does not exist.
         """
-        return (
+        if not FileBuilder._IS_WINDOWS:
             # Optimization: Avoid calling Path.resolve() if not on Windows
-            not FileBuilder._IS_WINDOWS or
+            return True
 
-            Path(filename).resolve().name == os.path.basename(filename))
+        basename = os.path.basename(filename)
+
+        # Optimization: Avoid calling Path.resolve() if the base name has no
+        # cased characters (e.g. "123" or "_0"), since then it can only have
+        # one case
+        return (
+            basename.lower() == basename.upper() or
+            Path(filename).resolve().name == basename)
 
     def _ensure_dir_case(self, dir_):
         r"""Ensure that the case of the specified directory is correct.
@@ -1561,6 +1690,24 @@ class FileBuilder:
                 'The return value of {:s} must be a JSON value'.format(
                     description))
 
+    @staticmethod
+    def _compute_changed_func_names(old_cache, new_cache):
+        """Return the names of the functions whose versions have changed.
+
+        Return a set of the names of the functions whose versions in
+        ``new_cache`` differ from their versions in ``old_cache``, as in
+        ``JsonUtil.is_equal``.
+        """
+        changed_func_names = set()
+        for func_name in (
+                old_cache.func_names_with_versions() +
+                new_cache.func_names_with_versions()):
+            if not JsonUtil.is_equal(
+                    old_cache.get_func_version(func_name),
+                    new_cache.get_func_version(func_name)):
+                changed_func_names.add(func_name)
+        return changed_func_names
+
     @staticmethod
     def _sanitize_versions(versions):
         """Equivalent implementation is contractually guaranteed."""
@@ -1587,17 +1734,56 @@ class FileBuilder:
         Raises:
             TypeError: If ``filename`` has the wrong type.
         """
+        # Optimization: Most filenames are plain strings that are already
+        # absolute, normalized paths, so we can skip os.path.abspath. This
+        # check is conservative; it only accepts POSIX paths that
+        # os.path.normpath would leave unchanged.
+        if (filename.__class__ is str and not FileBuilder._IS_WINDOWS and
+                filename.startswith('/') and '//' not in filename and
+                '/./' not in filename and '/../' not in filename and
+                not filename.endswith(('/', '/.', '/..'))):
+            return filename
+
+        # Optimization: Memoize the results for absolute paths, since we tend
+        # to see the same filenames repeatedly. We can't memoize relative
+        # paths (or Windows paths without a drive), because the results depend
+        # on the current working directory.
+        if (filename.__class__ is str and os.path.isabs(filename) and
+                (not FileBuilder._IS_WINDOWS or
+                    os.path.splitdrive(filename)[0])):
+            return FileBuilder._sanitize_absolute_filename(filename)
+
         # Cast the result to a string in case "filename"'s type is a subclass
         # of str
         return str(os.path.abspath(os.fsdecode(filename)))
 
     @staticmethod
-    def _try_to_remove_file(filename):
+    @functools.lru_cache(maxsize=8192)
+    def _sanitize_absolute_filename(filename):
+        """Return ``os.path.abspath(filename)``, memoized.
+
+        This is an implementation of ``_sanitize_filename`` for absolute
+        paths of type ``str``.
+        """
+        return os.path.abspath(filename)
+
+    @staticmethod
+    def _try_to_remove_file(filename, dir_entry=None):
         """Remove the specified regular file, if it exists.
 
-        This does not raise an exception if the removal fails.
+        This does not raise an exception if the removal fails. If
+        ``dir_entry`` is not ``None``, we use the ``os.DirEntry``
+        ``dir_entry`` for the file to check whether it is a regular
+        file, instead of calling ``os.path.isfile``.
         """
-        if os.path.isfile(filename):
+        if dir_entry is None:
+            is_file = os.path.isfile(filename)
+        else:
+            try:
+                is_file = dir_entry.is_file()
+            except OSError:
+                is_file = False
+        if is_file:
             try:
                 os.remove(filename)
             except OSError:
@@ -1606,6 +1792,30 @@ class FileBuilder:
                 return
             logger.info('Removed {:s}'.format(filename))
 
+    @staticmethod
+    def _try_to_remove_files(filenames, dir_entries):
+        """Remove the specified regular files, if they exist.
+
+        This does not raise an exception if a removal fails. Removing
+        files is I/O-bound, so if there are many files, we remove them
+        concurrently.
+
+        Arguments:
+            filenames (list<str>): The files.
+            dir_entries (list<DirEntry>): The ``dir_entry`` arguments to
+                pass to ``_try_to_remove_file`` for the corresponding
+                elements of ``filenames``.
+        """
+        if len(filenames) < FileBuilder._MIN_CONCURRENT_REMOVE_COUNT:
+            for filename, dir_entry in zip(filenames, dir_entries):
+                FileBuilder._try_to_remove_file(filename, dir_entry)
+        else:
+            with ThreadPoolExecutor() as executor:
+                list(
+                    executor.map(
+                        FileBuilder._try_to_remove_file, filenames,
+                        dir_entries))
+
     def _assert_build_file_call_valid(self):
         """Raise if we may not perform the ``BuildFileOperation``.
 
@@ -1711,8 +1921,8 @@ class FileBuilder:
         filename = operation.filename
         try:
             operation.return_value = self._call_and_sanitize_return_value(
-                func, [self, filename] + copy.deepcopy(operation.args),
-                copy.deepcopy(operation.kwargs),
+                func, [self, filename] + JsonUtil.copy(operation.args),
+                JsonUtil.copy(operation.kwargs),
                 'the build_file* call for {:s}'.format(filename))
 
             operation.file_comparison_result = (
@@ -1814,8 +2024,8 @@ class FileBuilder:
             self._new_cache.start_subbuild(subbuild_key, operation)
             try:
                 operation.return_value = self._call_and_sanitize_return_value(
-                    func, [self] + copy.deepcopy(operation.args),
-                    copy.deepcopy(operation.kwargs), description)
+                    func, [self] + JsonUtil.copy(operation.args),
+                    JsonUtil.copy(operation.kwargs), description)
             except Exception:
                 operation.raised = True
                 raise
@@ -1834,13 +2044,38 @@ class FileBuilder:
         directories in ``dirs``. This does not raise any exceptions or
         log any messages for directories we are unable to remove.
         """
-        sorted_dirs = sorted(dirs, key=lambda dir_: -len(dir_))
-        for dir_ in sorted_dirs:
-            try:
-                os.rmdir(dir_)
-            except OSError:
-                continue
-            logger.info('Removed empty directory {:s}'.format(dir_))
+        if len(dirs) < FileBuilder._MIN_CONCURRENT_REMOVE_COUNT:
+            sorted_dirs = sorted(dirs, key=len, reverse=True)
+            for dir_ in sorted_dirs:
+                FileBuilder._try_to_remove_empty_dir(dir_)
+            return
+
+        # Removing directories is I/O-bound, so remove them concurrently. A
+        # directory has more separators than any of its ancestors, so we may
+        # concurrently remove the directories with a given number of
+        # separators, once we have removed those with more separators.
+        depth_to_dirs = {}
+        for dir_ in dirs:
+            depth_to_dirs.setdefault(dir_.count(os.sep), []).append(dir_)
+        with ThreadPoolExecutor() as executor:
+            for depth in sorted(depth_to_dirs.keys(), reverse=True):
+                list(
+                    executor.map(
+                        FileBuilder._try_to_remove_empty_dir,
+                        depth_to_dirs[depth]))
+
+    @staticmethod
+    def _try_to_remove_empty_dir(dir_):
+        """Remove the specified directory, if it is empty.
+
+        This does not raise any exceptions or log any messages if we are
+        unable to remove the directory.
+        """
+        try:
+            os.rmdir(dir_)
+        except OSError:
+            return
+        logger.info('Removed empty directory {:s}'.format(dir_))
 
     @staticmethod
     def _create_dirs(dirs):
@@ -1855,7 +2090,7 @@ class FileBuilder:
         Arguments:
             dirs (list<str>): The directories.
         """
-        sorted_dirs = sorted(dirs, key=lambda dir_: len(dir_))
+        sorted_dirs = sorted(dirs, key=len)
         for dir_ in sorted_dirs:
             try:
                 os.mkdir(dir_)
@@ -1871,11 +2106,11 @@ class FileBuilder:
         """Call ``_new_cache.add_created_dirs`` with the appropriate value.
 
         Call ``_new_cache.add_created_dirs``, passing as an argument any
-        directories that are in ``_build_dirs.created_dirs()`` or
+        directories that are in ``_build_dirs.created_dirs_map()`` or
         ``cache_file_created_dirs``. This also calls
         ``_ensure_dir_case`` on any directories that are in
         ``cache_file_created_dirs`` but not
-        ``_build_dirs.created_dirs()``.
+        ``_build_dirs.created_dirs_map()``.
 
         Arguments:
             cache_file_created_dirs (list<str>): The directories we
@@ -1886,14 +2121,15 @@ class FileBuilder:
                 real file system, to store build files, but are deleted
                 in the virtual state of the file system.
         """
-        created_dirs = self._build_dirs.created_dirs()
-        norm_cased_created_dirs = set(
-            [os.path.normcase(dir_) for dir_ in created_dirs])
+        # BuildDirs already has the norm-cased filenames of the created
+        # directories, so we don't need to call os.path.normcase on them
+        created_dirs_map = self._build_dirs.created_dirs_map()
+        created_dirs = list(created_dirs_map.values())
         norm_cased_error_created_dirs = set(
             self._build_dirs.norm_cased_error_created_dirs())
         for dir_ in cache_file_created_dirs:
             norm_cased_dir = os.path.normcase(dir_)
-            if norm_cased_dir not in norm_cased_created_dirs:
+            if norm_cased_dir not in created_dirs_map:
                 created_dirs.append(dir_)
                 norm_cased_error_created_dirs.discard(norm_cased_dir)
                 self._ensure_dir_case(dir_)
@@ -1914,11 +2150,36 @@ class FileBuilder:
                 of the file system.
         """
         logger.info('Committing build operation')
+        executor = self._simple_operation_executor
+        filenames_to_remove = []
+        filenames_to_check = []
         for filename in self._old_cache.created_files():
-            if (not self._simple_operation_executor.is_file(filename) and
-                    not self._simple_operation_executor.is_cache_file(
-                        filename)):
-                FileBuilder._try_to_remove_file(filename)
+            if executor.is_cache_file(filename):
+                continue
+            is_file_no_read = executor.is_file_no_read(filename)
+            if is_file_no_read is None:
+                filenames_to_check.append(filename)
+            elif not is_file_no_read:
+                filenames_to_remove.append(filename)
+        dir_entries_to_remove = [None] * len(filenames_to_remove)
+
+        # Check the files whose presence in the virtual state of the file
+        # system depends on the real file system
+        dir_entries, norm_cased_scanned_dirs = (
+            FileBuilder._dir_entries_for_files(filenames_to_check))
+        for filename in filenames_to_check:
+            norm_cased_filename = os.path.normcase(filename)
+            dir_entry = dir_entries.get(norm_cased_filename)
+            if dir_entry is None:
+                if (os.path.dirname(norm_cased_filename) in
+                        norm_cased_scanned_dirs):
+                    # The file doesn't exist, so there is nothing to remove
+                    continue
+            if not executor.is_file_using_dir_entry(filename, dir_entry):
+                filenames_to_remove.append(filename)
+                dir_entries_to_remove.append(dir_entry)
+        FileBuilder._try_to_remove_files(
+            filenames_to_remove, dir_entries_to_remove)
 
         dirs_to_remove = set(norm_cased_error_created_dirs)
         for dir_ in self._old_cache.created_dirs():
@@ -1927,6 +2188,37 @@ class FileBuilder:
         FileBuilder._remove_empty_dirs(list(dirs_to_remove))
         logger.info('Committed build operation')
 
+    @staticmethod
+    def _dir_entries_for_files(filenames):
+        """Return the ``os.DirEntry`` objects for the specified files.
+
+        Return a pair of a map and a set. The map maps from the
+        norm-cased filename of each of the specified files that is
+        present in the real file system to its ``os.DirEntry``. The set
+        consists of the norm-cased parent directories we were able to
+        scan. A file whose parent directory is in the set but which is
+        absent from the map does not exist. We obtain the entries by
+        scanning each parent directory once, which is normally faster
+        than checking the files one at a time.
+        """
+        norm_cased_filenames = set([
+            os.path.normcase(filename) for filename in filenames])
+        norm_cased_dirs = set([
+            os.path.dirname(norm_cased_filename)
+            for norm_cased_filename in norm_cased_filenames])
+        dir_entries = {}
+        norm_cased_scanned_dirs = set()
+        for norm_cased_dir in norm_cased_dirs:
+            try:
+                for dir_entry in os.scandir(norm_cased_dir):
+                    norm_cased_filename = os.path.normcase(dir_entry.path)
+                    if norm_cased_filename in norm_cased_filenames:
+                        dir_entries[norm_cased_filename] = dir_entry
+            except OSError:
+                continue
+            norm_cased_scanned_dirs.add(norm_cased_dir)
+        return dir_entries, norm_cased_scanned_dirs
+
     def _roll_back(self, cache_file_created_dirs):
         """Roll back (or undo) a build operation.
 
@@ -1936,19 +2228,26 @@ class FileBuilder:
         """
         logger.warning('Rolling back build operation, due to an exception')
 
-        created_dirs = (
-            self._build_dirs.created_dirs() + cache_file_created_dirs)
-        dirs_to_remove = set([os.path.normcase(dir_) for dir_ in created_dirs])
+        old_created_dirs = self._old_cache.created_dirs()
+        dirs_to_remove = set(self._build_dirs.created_dirs_map().keys())
         dirs_to_remove.update(self._build_dirs.norm_cased_error_created_dirs())
-        for dir_ in self._old_cache.created_dirs():
-            dirs_to_remove.discard(os.path.normcase(dir_))
+        if FileBuilder._IS_WINDOWS:
+            dirs_to_remove.update(
+                [os.path.normcase(dir_) for dir_ in cache_file_created_dirs])
+            dirs_to_remove.difference_update(
+                [os.path.normcase(dir_) for dir_ in old_created_dirs])
+        else:
+            # Optimization: os.path.normcase has no effect if we're not on
+            # Windows
+            dirs_to_remove.update(cache_file_created_dirs)
+            dirs_to_remove.difference_update(old_created_dirs)
 
         for filename in self._new_cache.created_files():
             if not self._old_cache.created_file(filename):
                 FileBuilder._try_to_remove_file(filename)
         FileBuilder._remove_empty_dirs(list(dirs_to_remove))
 
-        FileBuilder._create_dirs(self._old_cache.created_dirs())
+        FileBuilder._create_dirs(old_created_dirs)
         self._backups.restore_all()
         logger.info('Rolled back build operation')
 
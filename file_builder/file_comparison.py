@@ -24,3 +24,11 @@ class FileComparison(Enum):
 
     METADATA = 1
     HASH = 2
+
+
+# Store each member's name in a plain attribute, so that hot paths such as
+# FileBuilder.read_text don't have to go through the descriptor for
+# Enum.name
+for _file_comparison in FileComparison:
+    _file_comparison._cached_name = _file_comparison.name
+del _file_comparison
@@ -33,6 +33,12 @@ class Operation:
       exception.
     """
 
+    # Operation records are created for every operation, and there may be a
+    # great many of them, so we use __slots__ to reduce their memory footprint
+    # and construction time. Every subclass must define __slots__ as well, or
+    # its instances will still have a __dict__.
+    __slots__ = ('args', 'return_value', 'is_finished')
+
     def __init__(self, args, return_value, is_finished):
         self.args = args
         self.return_value = return_value
@@ -54,6 +60,8 @@ class SimpleOperation(Operation):
       ``SimpleOperationExecutor.OPERATIONS``.
     """
 
+    __slots__ = ('name', 'exception_type_str')
+
     def __init__(
             self, name, args, return_value=None, exception_type_str=None,
             is_finished=False):
@@ -92,6 +100,9 @@ class ComplexOperation(Operation):
       ``True``.
     """
 
+    __slots__ = (
+        'func_name', 'kwargs', 'suboperations', 'raised', 'setup_failed')
+
     def __init__(
             self, func_name, args, kwargs, suboperations, return_value, raised,
             setup_failed, is_finished):
@@ -120,6 +131,8 @@ class BuildFileOperation(ComplexOperation):
     * ``str filename``: The file being built.
     """
 
+    __slots__ = ('filename', 'file_comparison', 'file_comparison_result')
+
     def __init__(
             self, filename, file_comparison, func_name, args, kwargs,
             suboperations, return_value, file_comparison_result, raised,
@@ -138,4 +151,19 @@ class SubbuildOperation(ComplexOperation):
     See the comments for ``Operation``.
     """
 
-    pass
+    # Private attributes:
+    #
+    # object _subbuild_key - The cached return value of
+    #     Cache.subbuild_key(self), or None if we haven't computed it yet. The
+    #     key only depends on func_name, args, and kwargs, which don't change
+    #     after we create the operation.
+
+    __slots__ = ('_subbuild_key',)
+
+    def __init__(
+            self, func_name, args, kwargs, suboperations, return_value, raised,
+            setup_failed, is_finished):
+        super().__init__(
+            func_name, args, kwargs, suboperations, return_value, raised,
+            setup_failed, is_finished)
+        self._subbuild_key = None
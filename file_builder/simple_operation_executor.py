@@ -1,8 +1,11 @@
 import hashlib
+import operator
 import os
 import stat
 import threading
 
+from .json_util import JsonUtil
+
 
 class SimpleOperationExecutor:
     """Executes simple operations.
@@ -30,12 +33,23 @@ class SimpleOperationExecutor:
     # str _norm_cased_cache_filename - The norm-cased cache file.
     # Cache _old_cache - The Cache object storing the cached results from the
     #     previous build.
+    # set<str> _reusable_operation_names - The names of the simple operations
+    #     in OPERATIONS whose versions in _old_cache and _new_cache are equal,
+    #     as in JsonUtil.is_equal. Operation versions don't change during a
+    #     build, so we compute this once, rather than comparing the versions
+    #     every time we check a cached SimpleOperation.
 
-    # The names of all available simple operations. They each correspond to a
-    # SimpleOperationExecutor method of the same name.
-    OPERATIONS = set([
-        'exists', 'get_size', 'is_dir', 'is_file', 'list_dir', 'read', 'walk'
-    ])
+    # Whether the operating system is Windows. os.path.normcase has no effect
+    # on other operating systems.
+    _IS_WINDOWS = os.name == 'nt'
+
+    # The maximum size of the buffer _file_hash uses to read files, in bytes
+    _HASH_BUFFER_SIZE = 1 << 20
+
+    # The minimum size of the buffer _file_hash uses to read files, in bytes.
+    # Some files have more contents than their reported sizes indicate, e.g.
+    # procfs files report a size of 0, so we don't trust small sizes.
+    _MIN_HASH_BUFFER_SIZE = 1 << 16
 
     def __init__(self, cache_filename, old_cache, new_cache, build_dirs):
         self._norm_cased_cache_filename = os.path.normcase(cache_filename)
@@ -44,6 +58,25 @@ class SimpleOperationExecutor:
         self._build_dirs = build_dirs
         self._hash_cache = {}
         self._hash_cache_lock = threading.Lock()
+        self._reusable_operation_names = set([
+            name for name in SimpleOperationExecutor.OPERATIONS
+            if JsonUtil.is_equal(
+                old_cache.get_operation_version(name),
+                new_cache.get_operation_version(name))])
+
+    def is_reusable_operation(self, name):
+        """Return whether we may reuse cached results of the given operation.
+
+        Return whether the specified simple operation is available in
+        the current build and has the same version as in the previous
+        build, so that a cached ``SimpleOperation`` entry with that name
+        might be valid.
+
+        Arguments:
+            name (str): The operation's name, as in
+                ``SimpleOperation.name``.
+        """
+        return name in self._reusable_operation_names
 
     def exec(self, name, args, created_files):
         """Execute the specified simple operation.
@@ -65,9 +98,10 @@ class SimpleOperationExecutor:
             Exception: If the corresponding ``SimpleOperationExecutor``
                 method raised an exception.
         """
-        if name not in SimpleOperationExecutor.OPERATIONS:
+        func = SimpleOperationExecutor._OPERATION_FUNCS.get(name)
+        if func is None:
             raise ValueError('Invalid operation')
-        return getattr(self, name)(*(args + [created_files]))
+        return func(self, *(args + [created_files]))
 
     def file_comparison_result(self, filename, file_comparison_name):
         """Return the result of the specified file comparison.
@@ -92,15 +126,15 @@ class SimpleOperationExecutor:
                 the real file system.
             OSError: If some other type of OS error occurred.
         """
-        if file_comparison_name == 'METADATA':
-            return self._file_metadata(filename)
-        elif file_comparison_name == 'HASH':
-            return self._file_hash(filename)
-        else:
-            raise ValueError('Not a file comparison name')
+        return self._norm_cased_file_comparison_result(
+            os.path.normcase(filename), file_comparison_name)
 
     def is_cache_file(self, filename):
         """Return whether the specified file is the cache file."""
+        if not SimpleOperationExecutor._IS_WINDOWS:
+            # Optimization: Avoid calling os.path.normcase, which has no
+            # effect
+            return filename == self._norm_cased_cache_filename
         return os.path.normcase(filename) == self._norm_cased_cache_filename
 
     def read(self, filename, file_comparison_name, created_files=None):
@@ -138,8 +172,8 @@ class SimpleOperationExecutor:
                     'The requested file does not exist: {:s}'.format(filename))
 
         try:
-            result = self.file_comparison_result(
-                filename, file_comparison_name)
+            result = self._norm_cased_file_comparison_result(
+                norm_cased_filename, file_comparison_name)
         except FileNotFoundError:
             raise FileNotFoundError(
                 'The requested file does not exist: {:s}'.format(filename))
@@ -167,12 +201,12 @@ class SimpleOperationExecutor:
                 created, if any.
         """
         self._assert_is_dir(dir_, created_files)
-        subfiles = []
-        for subfile in self._list_dir_superset(dir_, created_files):
-            absolute_subfile = os.path.join(dir_, subfile)
-            if self.exists(absolute_subfile, created_files):
-                subfiles.append(subfile)
-        return subfiles
+        return [
+            subfile for subfile, dir_entry in self._list_dir_superset(
+                dir_, created_files)
+            if self._exists(
+                os.path.normcase(os.path.join(dir_, subfile)), created_files,
+                dir_entry)]
 
     def walk(self, dir_, top_down, created_files=None):
         """Return the files in the specified directory, recursively.
@@ -196,34 +230,178 @@ class SimpleOperationExecutor:
 
         This has the same semantics as ``FileBuilder.is_file``.
 
+        Arguments:
+            filename (str): The filename.
+            created_files (CreatedFiles): The files to regard as
+                created, if any.
+        """
+        return self._is_file(os.path.normcase(filename), created_files, None)
+
+    def is_file_no_read(self, filename):
+        """Return ``is_file(filename)``, if we can tell without reading.
+
+        Return ``True`` or ``False`` if we can determine whether the
+        specified filename refers to a regular file without checking the
+        real file system, and ``None`` otherwise. If this returns
+        ``None``, then ``is_file(filename)`` is equivalent to
+        ``os.path.isfile(filename)``.
+        """
+        return self._is_file_no_read(os.path.normcase(filename), None)
+
+    def is_file_using_dir_entry(self, filename, dir_entry):
+        """Return whether the specified filename refers to a regular file.
+
+        This is the same as ``is_file(filename)``, except that if
+        ``dir_entry`` is not ``None``, we use the ``os.DirEntry``
+        ``dir_entry`` for the file instead of calling
+        ``os.path.isfile``. This is useful when checking many files
+        whose parent directories we have already scanned.
+        """
+        return self._is_file(os.path.normcase(filename), None, dir_entry)
+
+    def is_dir_using_dir_entry(self, filename, dir_entry):
+        """Return whether the specified filename refers to a directory.
+
+        This is the same as ``is_dir(filename)``, except that if
+        ``dir_entry`` is not ``None``, we use the ``os.DirEntry``
+        ``dir_entry`` for the file instead of calling ``os.path.isdir``.
+        """
+        return self._is_dir(os.path.normcase(filename), None, dir_entry)
+
+    def is_dir(self, filename, created_files=None):
+        """Return whether the specified filename refers to a directory.
+
+        This has the same semantics as ``FileBuilder.is_dir``.
+
+        Arguments:
+            filename (str): The filename.
+            created_files (CreatedFiles): The files to regard as
+                created, if any.
+        """
+        return self._is_dir(os.path.normcase(filename), created_files, None)
+
+    def exists(self, filename, created_files=None):
+        """Return whether the specified file exists.
+
+        This has the same semantics as ``FileBuilder.exists``.
+
+        Arguments:
+            filename (str): The filename.
+            created_files (CreatedFiles): The files to regard as
+                created, if any.
+        """
+        is_file, is_dir = self.is_file_or_dir(filename, created_files)
+        return is_file or is_dir
+
+    def is_file_or_dir(self, filename, created_files=None):
+        """Return whether the specified file is a regular file or directory.
+
+        Return a pair ``(is_file(filename, created_files),
+        is_dir(filename, created_files))``. This checks the real file
+        system using at most one ``stat`` call, rather than one for each
+        of ``is_file`` and ``is_dir``.
+
         Arguments:
             filename (str): The filename.
             created_files (CreatedFiles): The files to regard as
                 created, if any.
         """
         norm_cased_filename = os.path.normcase(filename)
+        is_file = self._is_file_no_read(norm_cased_filename, created_files)
+        is_dir = None
+        if created_files is not None:
+            if created_files.has_norm_cased_dir(norm_cased_filename):
+                is_dir = True
+            elif created_files.has_norm_cased_file(norm_cased_filename):
+                is_dir = False
+        if is_dir is None and self._build_dirs.is_removed_norm_case(
+                norm_cased_filename):
+            is_dir = False
+
+        if is_file is None or is_dir is None:
+            try:
+                mode = os.stat(norm_cased_filename).st_mode
+            except (OSError, ValueError):
+                mode = 0
+
+            if is_file is None:
+                is_file = stat.S_ISREG(mode)
+                if is_file:
+                    self._build_dirs.handle_norm_cased_dir_exists(
+                        os.path.dirname(norm_cased_filename))
+            if is_dir is None:
+                is_dir = stat.S_ISDIR(mode)
+                if is_dir:
+                    self._build_dirs.handle_norm_cased_dir_exists(
+                        norm_cased_filename)
+        return is_file, is_dir
+
+    def get_size(self, filename, created_files=None):
+        """Return the size of the specified file in bytes.
+
+        This has the same semantics as ``FileBuilder.get_size``.
+
+        Arguments:
+            filename (str): The filename.
+            created_files (CreatedFiles): The files to regard as
+                created, if any.
+        """
+        self._assert_exists(filename, created_files)
+        return os.path.getsize(filename)
+
+    # A map from the name of each simple operation to the method that
+    # executes it. This is faster than checking OPERATIONS and calling
+    # getattr.
+    _OPERATION_FUNCS = {
+        'exists': exists,
+        'get_size': get_size,
+        'is_dir': is_dir,
+        'is_file': is_file,
+        'list_dir': list_dir,
+        'read': read,
+        'walk': walk,
+    }
+
+    # The names of all available simple operations. They each correspond to a
+    # SimpleOperationExecutor method of the same name.
+    OPERATIONS = set(_OPERATION_FUNCS.keys())
+
+    def _is_file(self, norm_cased_filename, created_files, dir_entry):
+        """Implementation of ``is_file``.
+
+        Arguments:
+            norm_cased_filename (str): The norm-cased filename.
+            created_files (CreatedFiles): The files to regard as
+                created, if any.
+            dir_entry (DirEntry): The ``os.DirEntry`` for the file
+                from a scan of its parent directory that we performed as
+                part of the current operation, if any. If this is not
+                ``None``, we use it instead of ``os.path.isfile``.
+        """
         is_file_no_read = self._is_file_no_read(
             norm_cased_filename, created_files)
         if is_file_no_read is not None:
             return is_file_no_read
-        elif os.path.isfile(norm_cased_filename):
+        elif SimpleOperationExecutor._is_real_file(
+                norm_cased_filename, dir_entry):
             self._build_dirs.handle_norm_cased_dir_exists(
                 os.path.dirname(norm_cased_filename))
             return True
         else:
             return False
 
-    def is_dir(self, filename, created_files=None):
-        """Return whether the specified filename refers to a directory.
-
-        This has the same semantics as ``FileBuilder.is_dir``.
+    def _is_dir(self, norm_cased_dir, created_files, dir_entry):
+        """Implementation of ``is_dir``.
 
         Arguments:
-            filename (str): The filename.
+            norm_cased_dir (str): The norm-cased filename.
             created_files (CreatedFiles): The files to regard as
                 created, if any.
+            dir_entry (DirEntry): The ``os.DirEntry`` for the file
+                from a scan of its parent directory that we performed as
+                part of the current operation, if any. If this is not
+                ``None``, we use it instead of ``os.path.isdir``.
         """
-        norm_cased_dir = os.path.normcase(filename)
         if created_files is not None:
             if created_files.has_norm_cased_dir(norm_cased_dir):
                 return True
@@ -232,42 +410,87 @@ class SimpleOperationExecutor:
 
         if self._build_dirs.is_removed_norm_case(norm_cased_dir):
             return False
-        elif os.path.isdir(norm_cased_dir):
+        elif SimpleOperationExecutor._is_real_dir(norm_cased_dir, dir_entry):
             self._build_dirs.handle_norm_cased_dir_exists(norm_cased_dir)
             return True
         else:
             return False
 
-    def exists(self, filename, created_files=None):
+    def _exists(self, norm_cased_filename, created_files, dir_entry):
         """Return whether the specified file exists.
 
-        This has the same semantics as ``FileBuilder.exists``.
-
-        Arguments:
-            filename (str): The filename.
-            created_files (CreatedFiles): The files to regard as
-                created, if any.
+        This is the same as ``exists``, except that it takes a
+        norm-cased filename, and if ``dir_entry`` is not ``None``, we
+        use the ``os.DirEntry`` ``dir_entry`` for the file instead of
+        checking the file system. This is useful for checking the
+        results of a directory scan.
         """
         return (
-            self.is_file(filename, created_files) or
-            self.is_dir(filename, created_files))
+            self._is_file(norm_cased_filename, created_files, dir_entry) or
+            self._is_dir(norm_cased_filename, created_files, dir_entry))
 
-    def get_size(self, filename, created_files=None):
-        """Return the size of the specified file in bytes.
+    @staticmethod
+    def _is_real_file(filename, dir_entry):
+        """Return ``os.path.isfile(filename)``.
 
-        This has the same semantics as ``FileBuilder.get_size``.
+        If ``dir_entry`` is not ``None``, we use the ``os.DirEntry``
+        ``dir_entry`` for the file instead of checking the file system.
+        ``DirEntry`` normally caches the file type from the directory
+        scan, so this usually avoids a ``stat`` call.
+        """
+        if dir_entry is None:
+            return os.path.isfile(filename)
+        try:
+            return dir_entry.is_file()
+        except OSError:
+            return False
 
-        Arguments:
-            filename (str): The filename.
-            created_files (CreatedFiles): The files to regard as
-                created, if any.
+    @staticmethod
+    def _is_real_dir(filename, dir_entry):
+        """Return ``os.path.isdir(filename)``.
+
+        If ``dir_entry`` is not ``None``, we use the ``os.DirEntry``
+        ``dir_entry`` for the file instead of checking the file system.
         """
-        self._assert_exists(filename, created_files)
-        return os.path.getsize(filename)
+        if dir_entry is None:
+            return os.path.isdir(filename)
+        try:
+            return dir_entry.is_dir()
+        except OSError:
+            return False
+
+    @staticmethod
+    def _is_real_link(filename, dir_entry):
+        """Return ``os.path.islink(filename)``.
+
+        If ``dir_entry`` is not ``None``, we use the ``os.DirEntry``
+        ``dir_entry`` for the file instead of checking the file system.
+        """
+        if dir_entry is None:
+            return os.path.islink(filename)
+        try:
+            return dir_entry.is_symlink()
+        except OSError:
+            return False
+
+    def _norm_cased_file_comparison_result(
+            self, norm_cased_filename, file_comparison_name):
+        """Return ``file_comparison_result`` for a norm-cased filename.
+
+        This is the same as ``file_comparison_result``, but it takes the
+        result of ``os.path.normcase``, so that callers that already
+        computed it don't have to do so again.
+        """
+        if file_comparison_name == 'METADATA':
+            return self._file_metadata(norm_cased_filename)
+        elif file_comparison_name == 'HASH':
+            return self._file_hash(norm_cased_filename)
+        else:
+            raise ValueError('Not a file comparison name')
 
-    def _file_metadata(self, filename):
+    def _file_metadata(self, norm_cased_filename):
         """Implementation of ``file_comparison_result`` for ``'METADATA'``."""
-        stats = os.stat(filename)
+        stats = os.stat(norm_cased_filename)
         if stat.S_ISDIR(stats.st_mode):
             raise IsADirectoryError()
         return {
@@ -275,9 +498,8 @@ class SimpleOperationExecutor:
             'timeNs': stats.st_mtime_ns,
         }
 
-    def _file_hash(self, filename):
+    def _file_hash(self, norm_cased_filename):
         """Implementation of ``file_comparison_result`` for ``'HASH'``."""
-        norm_cased_filename = os.path.normcase(filename)
         is_built = self._new_cache.has_norm_cased_file(norm_cased_filename)
 
         # Check _hash_cache
@@ -285,20 +507,34 @@ class SimpleOperationExecutor:
             cache_entry = self._hash_cache.get(norm_cased_filename)
         if cache_entry is not None and cache_entry[1] == is_built:
             # Manually check whether the file exists, since we won't be calling
-            # "open"
-            if not os.path.isfile(norm_cased_filename):
-                if os.path.isdir(norm_cased_filename):
+            # "open". As with os.path.isfile, any failure to stat the file
+            # (e.g. NotADirectoryError) means it doesn't exist.
+            try:
+                mode = os.stat(norm_cased_filename).st_mode
+            except OSError:
+                raise FileNotFoundError()
+            if not stat.S_ISREG(mode):
+                if stat.S_ISDIR(mode):
                     raise IsADirectoryError()
                 else:
                     raise FileNotFoundError()
             return cache_entry[0]
 
         digest = hashlib.sha256()
-        with open(norm_cased_filename, 'rb') as file_:
-            bytes_ = file_.read(1024)
-            while len(bytes_) > 0:
-                digest.update(bytes_)
-                bytes_ = file_.read(1024)
+        with open(norm_cased_filename, 'rb', buffering=0) as file_:
+            # Read the file into a single reusable buffer, to reduce the
+            # number of Python-level calls and avoid allocating a bytes object
+            # for each chunk. Size the buffer to fit small files.
+            buffer_size = max(
+                min(
+                    os.fstat(file_.fileno()).st_size + 1,
+                    SimpleOperationExecutor._HASH_BUFFER_SIZE),
+                SimpleOperationExecutor._MIN_HASH_BUFFER_SIZE)
+            buffer_ = memoryview(bytearray(buffer_size))
+            size = file_.readinto(buffer_)
+            while size > 0:
+                digest.update(buffer_[:size])
+                size = file_.readinto(buffer_)
         hash_ = digest.hexdigest()
 
         with self._hash_cache_lock:
@@ -356,8 +592,9 @@ class SimpleOperationExecutor:
                 file.
             OSError: If some other type of OS error occurred.
         """
-        if not self.is_dir(filename, created_files):
-            if self.is_file(filename, created_files):
+        is_file, is_dir = self.is_file_or_dir(filename, created_files)
+        if not is_dir:
+            if is_file:
                 raise NotADirectoryError(
                     '{:s} is not a directory'.format(filename))
             else:
@@ -392,19 +629,23 @@ class SimpleOperationExecutor:
         returns the files in a consistent order.
 
         Returns:
-            list<str>: A superset of the subfiles.
+            list<tuple<str, DirEntry>>: A superset of the subfiles. Each
+                pair consists of the name of a subfile and the
+                ``os.DirEntry`` for the subfile, or ``None`` if the
+                subfile is only present in ``created_files``.
 
         Raises:
             OSError: If an OS error occurred.
         """
-        subfiles = os.listdir(dir_)
+        subfiles = [
+            (dir_entry.name, dir_entry) for dir_entry in os.scandir(dir_)]
         if created_files is not None:
             norm_cased_subfiles = set(
-                [os.path.normcase(subfile) for subfile in subfiles])
-            for subfile in created_files.list_dir(dir_):
-                if os.path.normcase(subfile) not in norm_cased_subfiles:
-                    subfiles.append(subfile)
-        return sorted(subfiles)
+                [os.path.normcase(subfile) for subfile, _ in subfiles])
+            subfiles.extend([
+                (subfile, None) for subfile in created_files.list_dir(dir_)
+                if os.path.normcase(subfile) not in norm_cased_subfiles])
+        return sorted(subfiles, key=operator.itemgetter(0))
 
     def _append_walk(self, dir_, top_down, created_files, results):
         """Append the result of walking ``dir_`` to the list ``results``.
@@ -412,28 +653,47 @@ class SimpleOperationExecutor:
         This is equivalent to ``results.extend(walk(dir_, top_down,
         created_files))``. This assumes that ``dir_`` is a directory.
         """
-        try:
-            list_dir_superset = self._list_dir_superset(dir_, created_files)
-        except OSError:
-            list_dir_superset = []
-
-        # Compute the subfiles and subdirectories
-        subdirs = []
-        subfiles = []
-        for subfile in list_dir_superset:
-            absolute_subfile = os.path.join(dir_, subfile)
-            if self.is_file(absolute_subfile, created_files):
-                subfiles.append(subfile)
-            elif self.is_dir(absolute_subfile, created_files):
-                subdirs.append(subfile)
-
-        # Append the tuple and recurse
-        if top_down:
-            results.append((dir_, subdirs, subfiles))
-        for subdir in subdirs:
-            absolute_subdir = os.path.join(dir_, subdir)
-            if not os.path.islink(absolute_subdir):
-                self._append_walk(
-                    absolute_subdir, top_down, created_files, results)
-        if not top_down:
-            results.append((dir_, subdirs, subfiles))
+        # Use an explicit stack rather than recursion, so that we can walk
+        # arbitrarily deep directory trees. Each element is either a directory
+        # to scan or, if we are walking bottom up, a tuple (dir_, subdirs,
+        # subfiles) to append to "results" once we have walked the
+        # subdirectories.
+        stack = [dir_]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is tuple:
+                results.append(item)
+                continue
+
+            dir_ = item
+            try:
+                list_dir_superset = self._list_dir_superset(
+                    dir_, created_files)
+            except OSError:
+                list_dir_superset = []
+
+            # Compute the subfiles and subdirectories
+            subdirs = []
+            subdir_entries = []
+            subfiles = []
+            for subfile, dir_entry in list_dir_superset:
+                norm_cased_subfile = os.path.normcase(
+                    os.path.join(dir_, subfile))
+                if self._is_file(norm_cased_subfile, created_files, dir_entry):
+                    subfiles.append(subfile)
+                elif self._is_dir(
+                        norm_cased_subfile, created_files, dir_entry):
+                    subdirs.append(subfile)
+                    subdir_entries.append(dir_entry)
+
+            # Append or push the tuple, then push the subdirectories in
+            # reverse order, so that we walk them in order
+            if top_down:
+                results.append((dir_, subdirs, subfiles))
+            else:
+                stack.append((dir_, subdirs, subfiles))
+            for index in range(len(subdirs) - 1, -1, -1):
+                absolute_subdir = os.path.join(dir_, subdirs[index])
+                if not SimpleOperationExecutor._is_real_link(
+                        absolute_subdir, subdir_entries[index]):
+                    stack.append(absolute_subdir)
@@ -19,6 +19,10 @@ class ArithmeticTest(FileBuilderTest):
     it tests cases where we repeatedly read a file that we just wrote.
     """
 
+    # A regular expression matching an operation in an operation file. It
+    # captures the operation, so that splitting on it keeps the operations.
+    _TOKEN_SEPARATOR_REGEX = re.compile(r'([+*/-])')
+
     def setUp(self):
         super().setUp()
         self._input_dir = os.path.join(self._temp_dir, 'Input')
@@ -32,17 +36,13 @@ class ArithmeticTest(FileBuilderTest):
         with builder.read_text(input_filename) as file_:
             contents = file_.read()
 
-        offsets = []
-        for match in re.finditer(r'[+*/-]', contents):
-            if match.start() > 0:
-                offsets.append(match.start())
-        offsets.append(len(contents))
+        # Split the contents into alternating operations and operands. The
+        # contents start with an operation, so the first token is empty.
+        tokens = ArithmeticTest._TOKEN_SEPARATOR_REGEX.split(contents)
 
         value = start_value
-        prev_offset = 0
-        for offset in offsets:
-            operation = contents[prev_offset]
-            operand = int(contents[prev_offset + 1:offset])
+        for operation, operand_str in zip(tokens[1::2], tokens[2::2]):
+            operand = int(operand_str)
             if operation == '+':
                 value += operand
             elif operation == '-':
@@ -53,7 +53,6 @@ class ArithmeticTest(FileBuilderTest):
                 value //= operand
             else:
                 raise RuntimeError('Unhandled operation')
-            prev_offset = offset
 
         self._write(
             output_filename,
@@ -1,6 +1,7 @@
 import os
 
 from .. import FileBuilder
+from ..build_dirs import BuildDirs
 from .file_builder_test import FileBuilderTest
 
 
@@ -104,6 +105,45 @@ class BuildDirsTest(FileBuilderTest):
             os.path.join(self._temp_dir, 'Dir3', 'Subdir', 'Output2.txt'),
             'text')
 
+    def test_is_known_norm_cased_dir(self):
+        """Test ``BuildDirs.is_known_norm_cased_dir``."""
+        dir_ = os.path.join(self._temp_dir, 'Dir')
+        subdir = os.path.join(dir_, 'Subdir')
+        other_dir = os.path.join(self._temp_dir, 'Other')
+        filename1 = os.path.join(subdir, 'Output1.txt')
+        filename2 = os.path.join(subdir, 'Output2.txt')
+        build_dirs = BuildDirs([], [])
+        self.assertFalse(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(subdir)))
+
+        # A directory that merely exists may be removed by a build function,
+        # so we shouldn't trust it
+        build_dirs.handle_norm_cased_dir_exists(os.path.normcase(other_dir))
+        self.assertFalse(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(other_dir)))
+
+        build_dirs.started_building_file(filename1, [dir_, subdir])
+        build_dirs.started_building_file(filename2, [])
+        self.assertTrue(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(subdir)))
+        self.assertTrue(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(dir_)))
+        self.assertTrue(
+            build_dirs.is_known_norm_cased_dir(
+                os.path.normcase(self._temp_dir)))
+        self.assertFalse(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(filename1)))
+
+        build_dirs.error_building_file(filename1)
+        self.assertTrue(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(subdir)))
+
+        build_dirs.error_building_file(filename2)
+        self.assertFalse(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(subdir)))
+        self.assertFalse(
+            build_dirs.is_known_norm_cased_dir(os.path.normcase(dir_)))
+
     def test_build_dirs(self):
         """Test correct determination of whether build directories are present.
         """
@@ -496,3 +496,82 @@ class BuildFileTest(FileBuilderTest):
         self.assertTrue(
             os.path.isfile(os.path.join(self._temp_dir, 'Foo', 'Bar')))
         self._check_contents(os.path.join(self._temp_dir, 'File.txt'), 'text')
+
+    def _many_files_build_file(self, builder, filename):
+        """Build file function for ``test_many_files`` and ``test_many_dirs``.
+        """
+        self._write(filename, 'text')
+
+    def _many_files_build(self, builder, filenames):
+        """Build function for ``test_many_files`` and ``test_many_dirs``."""
+        for filename in filenames:
+            builder.build_file(
+                filename, 'build_file', self._many_files_build_file)
+
+    def test_many_files(self):
+        """Test removing many output files that are no longer built.
+
+        There are enough files that ``FileBuilder`` removes them
+        concurrently.
+        """
+        filenames = [
+            os.path.join(self._temp_dir, 'Output{:d}.txt'.format(i))
+            for i in range(20)]
+        FileBuilder.build(
+            self._cache_filename, 'build_file_test', self._many_files_build,
+            filenames)
+
+        for filename in filenames:
+            self._check_contents(filename, 'text')
+
+        FileBuilder.build(
+            self._cache_filename, 'build_file_test', self._many_files_build,
+            filenames[:2])
+
+        for filename in filenames[:2]:
+            self._check_contents(filename, 'text')
+        for filename in filenames[2:]:
+            self.assertFalse(os.path.exists(filename))
+
+        FileBuilder.clean(self._cache_filename, 'build_file_test')
+
+        self.assertEqual([], os.listdir(self._temp_dir))
+
+    def test_many_dirs(self):
+        """Test removing many nested directories that are no longer needed.
+
+        There are enough directories that ``FileBuilder`` removes them
+        concurrently. Each directory must be removed after its
+        subdirectories.
+        """
+        dir_ = os.path.join(self._temp_dir, 'Dir')
+        filenames = []
+        for i in range(18):
+            filenames.append(os.path.join(dir_, 'Output.txt'))
+            filenames.append(
+                os.path.join(dir_, 'Subdir{:d}'.format(i), 'Output.txt'))
+            dir_ = os.path.join(dir_, 'Subdir')
+        filenames.append(os.path.join(dir_, 'Output.txt'))
+        kept_filename = os.path.join(self._temp_dir, 'Output.txt')
+
+        FileBuilder.build(
+            self._cache_filename, 'build_file_test', self._many_files_build,
+            filenames + [kept_filename])
+
+        for filename in filenames:
+            self._check_contents(filename, 'text')
+
+        FileBuilder.build(
+            self._cache_filename, 'build_file_test', self._many_files_build,
+            [kept_filename])
+
+        self.assertEqual(
+            set([os.path.basename(self._cache_filename), 'Output.txt']),
+            set(os.listdir(self._temp_dir)))
+
+        FileBuilder.build(
+            self._cache_filename, 'build_file_test', self._many_files_build,
+            filenames)
+        FileBuilder.clean(self._cache_filename, 'build_file_test')
+
+        self.assertEqual([], os.listdir(self._temp_dir))
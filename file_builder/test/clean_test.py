@@ -88,3 +88,50 @@ class CleanTest(FileBuilderTest):
         self._check_contents(
             os.path.join(self._temp_dir, 'Dir3', 'Subdir', 'Output.txt'),
             'external')
+
+    def _raised_build_file_inner(self, builder, filename):
+        """Inner build file function for ``test_clean_after_caught_error``."""
+        self._write(filename, 'text')
+
+    def _raised_build_file(self, builder, filename):
+        """Build file function for ``test_clean_after_caught_error``.
+
+        This builds another file and then raises an exception.
+        """
+        builder.build_file(
+            os.path.join(self._temp_dir, 'Dir', 'Subdir', 'Output2.txt'),
+            'build_file_inner', self._raised_build_file_inner)
+        raise RuntimeError()
+
+    def _raised_subbuild(self, builder):
+        """Subbuild function for ``test_clean_after_caught_error``."""
+        with self.assertRaises(RuntimeError):
+            builder.build_file(
+                os.path.join(self._temp_dir, 'Output1.txt'),
+                'build_file_raised', self._raised_build_file)
+
+    def _raised_build(self, builder):
+        """Build function for ``test_clean_after_caught_error``."""
+        builder.subbuild('subbuild', self._raised_subbuild)
+
+    def test_clean_after_caught_error(self):
+        """Test ``FileBuilder.clean`` after reusing a caught build file error.
+
+        Test that when we reuse a cached subbuild that caught an
+        exception from a build file function, we still account for the
+        directories of the files that function built before raising.
+        """
+        FileBuilder.build(
+            self._cache_filename, 'clean_test', self._raised_build)
+        FileBuilder.build(
+            self._cache_filename, 'clean_test', self._raised_build)
+
+        self._check_contents(
+            os.path.join(self._temp_dir, 'Dir', 'Subdir', 'Output2.txt'),
+            'text')
+        self.assertFalse(
+            os.path.exists(os.path.join(self._temp_dir, 'Output1.txt')))
+
+        FileBuilder.clean(self._cache_filename, 'clean_test')
+
+        self.assertEqual([], os.listdir(self._temp_dir))
@@ -1,4 +1,6 @@
 import os
+import shutil
+from unittest import mock
 
 from .. import FileBuilder
 from .. import FileComparison
@@ -196,6 +198,131 @@ class FileComparisonTest(FileBuilderTest):
                 "# Build 3\n"
                 'f1r57')
 
+    def _fstat_with_unreported_size(self, fd):
+        """Return ``os.fstat(fd)``, but with an ``st_size`` of 0.
+
+        This simulates files such as procfs files, whose contents are
+        larger than their reported sizes.
+        """
+        stats = self._real_fstat(fd)
+        return os.stat_result((
+            stats.st_mode, stats.st_ino, stats.st_dev, stats.st_nlink,
+            stats.st_uid, stats.st_gid, 0, stats.st_atime, stats.st_mtime,
+            stats.st_ctime))
+
+    def test_read_hash_unreported_size(self):
+        """Test ``FileComparison.HASH`` for files larger than their sizes.
+
+        Test ``FileBuilder``'s read methods with ``FileComparison.HASH``
+        when the sizes the operating system reports for the input files
+        are smaller than their contents.
+        """
+        input_filenames = [
+            os.path.join(self._temp_dir, 'Input1.txt'),
+            os.path.join(self._temp_dir, 'Input2.txt'),
+            os.path.join(self._temp_dir, 'Input3.txt')]
+        output_filenames = [
+            os.path.join(self._temp_dir, 'Output1.txt'),
+            os.path.join(self._temp_dir, 'Output2.txt'),
+            os.path.join(self._temp_dir, 'Output3.txt')]
+        contents1 = 'a' * 200000
+        contents2 = 'a' * 199999 + 'b'
+        self._real_fstat = os.fstat
+        with mock.patch('os.fstat', self._fstat_with_unreported_size):
+            for filename in input_filenames:
+                self._write(filename, contents1)
+            self._read_build(FileComparison.HASH)
+
+            for filename in output_filenames:
+                self._check_contents(
+                    filename,
+                    "# Build 1\n"
+                    '{:s}'.format(contents1))
+
+            self._read_build(FileComparison.HASH)
+
+            for filename in output_filenames:
+                self._check_contents(
+                    filename,
+                    "# Build 1\n"
+                    '{:s}'.format(contents1))
+
+            # Only change the end of each file, to check that we hash the
+            # entire file
+            for filename in input_filenames:
+                self._write(filename, contents2)
+            self._read_build(FileComparison.HASH)
+
+            for filename in output_filenames:
+                self._check_contents(
+                    filename,
+                    "# Build 3\n"
+                    '{:s}'.format(contents2))
+
+    def _replaced_dir_build_file(self, builder, output_filename):
+        """Build file function for ``test_read_hash_replaced_dir``."""
+        try:
+            with builder.read_text(
+                    os.path.join(self._temp_dir, 'Dir', 'Input.txt'),
+                    FileComparison.HASH) as input_file:
+                contents = input_file.read()
+        except FileNotFoundError:
+            contents = 'missing'
+        self._write(
+            output_filename,
+            "# Build {:d}\n"
+            '{:s}'.format(self._build_number, contents))
+
+    def _replaced_dir_build_func(self, builder):
+        """Build function for ``test_read_hash_replaced_dir``."""
+        builder.build_file(
+            os.path.join(self._temp_dir, 'Output1.txt'), 'build_file',
+            self._replaced_dir_build_file)
+        if self._build_number == 2:
+            dir_ = os.path.join(self._temp_dir, 'Dir')
+            shutil.rmtree(dir_)
+            self._write(dir_, 'not a directory')
+        builder.build_file(
+            os.path.join(self._temp_dir, 'Output2.txt'), 'build_file',
+            self._replaced_dir_build_file)
+
+    def test_read_hash_replaced_dir(self):
+        """Test ``FileComparison.HASH`` when a parent dir becomes a file.
+
+        Test reading a file with ``FileComparison.HASH`` after we have
+        already hashed it in the current build and its parent directory
+        has since been replaced with a regular file.
+        """
+        os.mkdir(os.path.join(self._temp_dir, 'Dir'))
+        self._write(os.path.join(self._temp_dir, 'Dir', 'Input.txt'), 'text')
+        self._build_number = 1
+        FileBuilder.build(
+            self._cache_filename, 'file_comparison_test',
+            self._replaced_dir_build_func)
+
+        self._check_contents(
+            os.path.join(self._temp_dir, 'Output1.txt'),
+            "# Build 1\n"
+            'text')
+        self._check_contents(
+            os.path.join(self._temp_dir, 'Output2.txt'),
+            "# Build 1\n"
+            'text')
+
+        self._build_number = 2
+        FileBuilder.build(
+            self._cache_filename, 'file_comparison_test',
+            self._replaced_dir_build_func)
+
+        self._check_contents(
+            os.path.join(self._temp_dir, 'Output1.txt'),
+            "# Build 1\n"
+            'text')
+        self._check_contents(
+            os.path.join(self._temp_dir, 'Output2.txt'),
+            "# Build 2\n"
+            'missing')
+
     def _write_build_file(self, builder, filename):
         """Build file function for ``test_write_*``."""
         self._write(
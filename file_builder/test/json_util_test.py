@@ -100,6 +100,22 @@ class JsonUtilTest(unittest.TestCase):
         value3 = {'foo': ['bar']}
         self._check_is_equal_to_hashable(value3, value3, True)
 
+    def test_copy(self):
+        """Test ``JsonUtil.copy``."""
+        self.assertIsNone(JsonUtil.copy(None))
+        self.assertIs(True, JsonUtil.copy(True))
+        self.assertEqual('foo', JsonUtil.copy('foo'))
+        self.assertEqual([], JsonUtil.copy([]))
+
+        value = {'foo': [1, {'bar': [True, None]}, 7.5], 'baz': {}}
+        copied_value = JsonUtil.copy(value)
+        self.assertEqual(value, copied_value)
+        self.assertIsNot(value, copied_value)
+        self.assertIsNot(value['foo'], copied_value['foo'])
+        self.assertIsNot(value['foo'][1], copied_value['foo'][1])
+        self.assertIsNot(value['foo'][1]['bar'], copied_value['foo'][1]['bar'])
+        self.assertIsNot(value['baz'], copied_value['baz'])
+
     def _assert_types_are_sanitized(self, value):
         """Assert that the specified value only contains sanitized types.
 